@@ -5,19 +5,26 @@
 Использует HTML-шаблоны и библиотеку WeasyPrint для создания PDF
 """
 
+import io
 import os
 import json
 import csv
+import mmap
+import multiprocessing
+import re
 import sys
 import platform
 import subprocess
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 try:
-    import pandas as pd
+    import orjson
 except ImportError:
-    pd = None
+    orjson = None
 
 try:
     from weasyprint import HTML, CSS
@@ -27,6 +34,233 @@ except ImportError:
     print("Установите её командой: pip install weasyprint")
     sys.exit(1)
 
+try:
+    import numpy as np
+except ImportError:
+    print("Ошибка: библиотека NumPy не установлена.")
+    print("Установите её командой: pip install numpy")
+    sys.exit(1)
+
+try:
+    from jinja2 import BaseLoader, Environment, TemplateNotFound, select_autoescape
+except ImportError:
+    print("Ошибка: библиотека Jinja2 не установлена.")
+    print("Установите её командой: pip install jinja2")
+    sys.exit(1)
+
+
+# Количество строк товаров на одной странице счёта
+ITEMS_PER_PAGE = 10
+
+# Формат денежных сумм в счёте
+MONEY_FORMAT = '{:,.2f}'
+
+# Начиная с этого размера JSON-файл отображается в память (mmap),
+# чтобы не копировать его содержимое целиком перед разбором
+JSON_MMAP_THRESHOLD = 1024 * 1024
+
+
+# CSS для поддержки кириллицы и пагинации
+# Разрывы страниц контролируются через класс .page-break
+PDF_CSS = '''
+@page {
+    size: A4;
+    margin: 2cm 2cm 3cm 2cm;
+}
+
+body {
+    font-family: 'DejaVu Sans', Arial, sans-serif;
+}
+
+.page-break {
+    page-break-before: always;
+}
+
+table {
+    page-break-inside: avoid;
+}
+
+thead {
+    display: table-header-group;
+}
+
+tbody tr {
+    page-break-inside: avoid;
+}
+
+.total-section {
+    page-break-inside: avoid;
+}
+'''
+
+# Ресурсы, которые не нужны при генерации PDF: подключаемые бандлы стилей
+# и скрипты. WeasyPrint синхронно загружает и разбирает каждый такой ресурс
+# Оба вида удаляются одним регулярным выражением за один проход по HTML
+_UNUSED_RESOURCES_RE = re.compile(
+    r'<link[^>]+href="[^"]*\.bundle[^"]*"[^>]*>'
+    r'|<script[^>]*>.*?</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Начиная с этого количества позиций суммы считаются JIT-ядром Numba
+NUMBA_MIN_ITEMS = 10000
+
+
+def _sum_totals_numpy(prices, quantities, out_totals) -> float:
+    """
+    Считает суммы по позициям и итоговую сумму средствами NumPy
+    
+    Args:
+        prices: Массив цен (float64)
+        quantities: Массив количеств (int64)
+        out_totals: Массив для сумм по позициям (float64)
+        
+    Returns:
+        Итоговая сумма
+    """
+    np.multiply(prices, quantities, out=out_totals)
+    return float(out_totals.sum())
+
+
+def _sum_totals_kernel(prices, quantities, out_totals):
+    # Умножение и суммирование за один проход без промежуточного массива,
+    # компилируется Numba при первом большом счёте
+    s = 0.0
+    for i in range(prices.shape[0]):
+        t = prices[i] * quantities[i]
+        out_totals[i] = t
+        s += t
+    return s
+
+
+# Скомпилированное ядро Numba: None - ещё не загружалось, False - Numba недоступна
+_sum_totals_numba = None
+
+
+def _get_sum_totals_numba():
+    """
+    Загружает Numba и компилирует ядро подсчёта сумм при первом обращении
+    
+    Импорт Numba занимает сотни миллисекунд, поэтому выполняется только
+    когда действительно встретился большой счёт
+    
+    Returns:
+        Скомпилированное ядро или None, если Numba не установлена
+    """
+    global _sum_totals_numba
+    if _sum_totals_numba is None:
+        try:
+            from numba import njit
+        except ImportError:
+            _sum_totals_numba = False
+        else:
+            _sum_totals_numba = njit(cache=True, fastmath=True)(_sum_totals_kernel)
+    return _sum_totals_numba or None
+
+
+def _sum_totals(prices, quantities, out_totals) -> float:
+    """
+    Считает суммы по позициям в out_totals и возвращает итоговую сумму
+    
+    Для больших счетов используется Numba (если установлена), для небольших
+    вызов JIT-ядра не окупается и используется NumPy
+    
+    Args:
+        prices: Массив цен (float64)
+        quantities: Массив количеств (int64)
+        out_totals: Массив для сумм по позициям (float64)
+        
+    Returns:
+        Итоговая сумма
+    """
+    if prices.shape[0] >= NUMBA_MIN_ITEMS:
+        kernel = _get_sum_totals_numba()
+        if kernel is not None:
+            return float(kernel(prices, quantities, out_totals))
+    return _sum_totals_numpy(prices, quantities, out_totals)
+
+
+def _normalize_ids(row: Dict[str, Any], fields: tuple):
+    """
+    Приводит поля с ID к интернированным строкам (на месте)
+    
+    После этого ID можно сравнивать и искать в индексах без повторных str()
+    
+    Args:
+        row: Запись с данными
+        fields: Имена полей с ID
+    """
+    for field in fields:
+        value = row.get(field)
+        if value is not None:
+            row[field] = sys.intern(str(value))
+
+
+def _resolve_pdf_opener():
+    """
+    Определяет функцию открытия PDF в системной программе
+    
+    Returns:
+        Функция, принимающая путь к PDF файлу
+    """
+    system = platform.system()
+    
+    if system == 'Windows':
+        return lambda pdf_path: os.startfile(str(pdf_path))
+    elif system == 'Darwin':  # macOS
+        return lambda pdf_path: subprocess.run(['open', str(pdf_path)])
+    else:  # Linux
+        return lambda pdf_path: subprocess.run(['xdg-open', str(pdf_path)])
+
+
+# Платформа определяется один раз при загрузке модуля
+_OPEN_PDF = _resolve_pdf_opener()
+
+
+class _TemplatePathLoader(BaseLoader):
+    """Загрузчик Jinja2, для которого имя шаблона - полный путь к файлу"""
+    
+    def get_source(self, environment, template):
+        path = Path(template)
+        try:
+            source = path.read_text(encoding='utf-8')
+        except OSError:
+            raise TemplateNotFound(template)
+        
+        mtime = path.stat().st_mtime_ns
+        
+        def uptodate() -> bool:
+            try:
+                return path.stat().st_mtime_ns == mtime
+            except OSError:
+                return False
+        
+        return source, str(path), uptodate
+
+
+class _PdfTemplatePathLoader(_TemplatePathLoader):
+    """Загрузчик шаблонов для PDF: удаляет из исходника бандлы стилей и скрипты"""
+    
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        # Исходник очищается один раз, в кэше Jinja2 хранится уже очищенный шаблон
+        return _UNUSED_RESOURCES_RE.sub('', source), filename, uptodate
+
+
+@dataclass
+class InvoiceItems:
+    """Товары счёта, хранящиеся по колонкам"""
+    
+    product_ids: List[Any]
+    names: List[str]
+    quantities: np.ndarray
+    prices: np.ndarray
+    totals: np.ndarray
+    total_amount: float
+    
+    def __len__(self) -> int:
+        return len(self.names)
+
 
 class InvoiceGenerator:
     """Класс для генерации PDF-счетов из данных"""
@@ -49,6 +283,46 @@ class InvoiceGenerator:
         
         # Настройка шрифта для поддержки кириллицы
         self.font_config = FontConfiguration()
+        
+        # CSS разбирается один раз и переиспользуется для всех счетов
+        self._css = CSS(string=PDF_CSS, font_config=self.font_config)
+        self._warmed_up = False
+        
+        # Кэш загруженных файлов: путь -> (mtime_ns, размер, данные)
+        self._file_cache: Dict[str, Tuple[int, int, List[Dict[str, Any]]]] = {}
+        
+        # Индексы покупателей и товаров по ID вместе со списками, из которых они построены
+        self._indices: Dict[str, Tuple[Tuple[List[Dict[str, Any]], ...], Dict[str, Dict[str, Any]]]] = {}
+        
+        # Индекс счетов по invoice_id и список данных, из которого он построен
+        self._invoice_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._invoice_index_source: Optional[List[Dict[str, Any]]] = None
+        
+        # Окружения Jinja2: шаблоны компилируются один раз и кэшируются без ограничения,
+        # автоэкранирование защищает от HTML-инъекций в данных покупателя.
+        # Окружение для PDF загружает шаблоны без бандлов стилей и скриптов
+        self._jinja_env = self._create_jinja_env(_TemplatePathLoader())
+        self._jinja_pdf_env = self._create_jinja_env(_PdfTemplatePathLoader())
+    
+    def _create_jinja_env(self, loader: BaseLoader) -> Environment:
+        """
+        Создаёт окружение Jinja2 для HTML-шаблонов счетов
+        
+        Args:
+            loader: Загрузчик шаблонов
+            
+        Returns:
+            Окружение Jinja2
+        """
+        env = Environment(
+            loader=loader,
+            autoescape=select_autoescape(['html']),
+            cache_size=-1,
+            trim_blocks=True,
+            lstrip_blocks=True
+        )
+        env.filters['money'] = MONEY_FORMAT.format
+        return env
     
     def get_data_files(self) -> List[Path]:
         """
@@ -57,18 +331,7 @@ class InvoiceGenerator:
         Returns:
             Список путей к файлам данных
         """
-        data_files = []
-        
-        if not self.data_dir.exists():
-            return []
-        
-        # Ищем CSV файлы
-        csv_files = list(self.data_dir.glob("*.csv"))
-        # Ищем JSON файлы
-        json_files = list(self.data_dir.glob("*.json"))
-        
-        data_files = csv_files + json_files
-        return sorted(data_files)
+        return self._scan_dir(self.data_dir, ('.csv', '.json'))
     
     def get_template_files(self) -> List[Path]:
         """
@@ -77,11 +340,29 @@ class InvoiceGenerator:
         Returns:
             Список путей к HTML-шаблонам
         """
-        if not self.templates_dir.exists():
+        return self._scan_dir(self.templates_dir, ('.html',))
+    
+    def _scan_dir(self, directory: Path, suffixes: tuple) -> List[Path]:
+        """
+        Получает отсортированный список файлов директории с заданными расширениями
+        
+        Директория просматривается за один проход через os.scandir,
+        расширения сравниваются без учёта регистра (Invoice.CSV, data.JSON)
+        
+        Args:
+            directory: Директория для поиска
+            suffixes: Допустимые расширения файлов
+            
+        Returns:
+            Список путей к найденным файлам
+        """
+        if not directory.exists():
             return []
         
-        template_files = list(self.templates_dir.glob("*.html"))
-        return sorted(template_files)
+        with os.scandir(directory) as entries:
+            files = [Path(entry.path) for entry in entries
+                     if entry.name.lower().endswith(suffixes) and entry.is_file()]
+        return sorted(files)
     
     def load_csv_data(self, file_path: Path) -> List[Dict[str, Any]]:
         """
@@ -93,18 +374,10 @@ class InvoiceGenerator:
         Returns:
             Список словарей с данными
         """
-        if pd is not None:
-            # Используем pandas, если доступен
-            df = pd.read_csv(file_path, encoding='utf-8')
-            return df.to_dict('records')
-        else:
-            # Используем стандартную библиотеку csv
-            data = []
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    data.append(row)
-            return data
+        # Для небольших справочников csv.DictReader быстрее pandas:
+        # нет затрат на импорт и построение DataFrame
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            return list(csv.DictReader(f))
     
     def load_json_data(self, file_path: Path) -> List[Dict[str, Any]]:
         """
@@ -116,14 +389,43 @@ class InvoiceGenerator:
         Returns:
             Список словарей с данными
         """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            # Тип корневого элемента определяем по первому значащему байту,
+            # не читая файл: peek берёт данные из буфера без сдвига позиции
+            first = f.peek(1).lstrip()[:1]
+            if first == b'[':
+                return self._parse_json(f)
+            if first == b'{':
+                # Одиночный объект оборачиваем в список
+                return [self._parse_json(f)]
+            
+            # Редкие случаи (BOM, скаляр, длинный пробельный префикс) - проверяем тип после разбора
+            data = self._parse_json(f)
+        
+        return data if isinstance(data, list) else [data]
+    
+    def _parse_json(self, f: BinaryIO) -> Any:
+        """
+        Разбирает JSON файл через orjson (если доступен) или стандартный json
         
-        # Если это не список, оборачиваем в список
-        if not isinstance(data, list):
-            data = [data]
+        Args:
+            f: Открытый в бинарном режиме JSON файл
+            
+        Returns:
+            Разобранные данные
+        """
+        if orjson is None:
+            # Используем стандартную библиотеку json
+            return json.load(f)
         
-        return data
+        if os.fstat(f.fileno()).st_size >= JSON_MMAP_THRESHOLD:
+            # Большие файлы разбираем прямо из отображения в память
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+        
+        # Используем orjson, если доступен
+        return orjson.loads(f.read())
     
     def load_data_file(self, file_path: Path) -> List[Dict[str, Any]]:
         """
@@ -135,77 +437,183 @@ class InvoiceGenerator:
         Returns:
             Список словарей с данными
         """
+        # Неизменённый файл разбираем только один раз: ключ - путь,
+        # актуальность проверяем по времени изменения и размеру
+        key = str(file_path.resolve())
+        stat = file_path.stat()
+        cached = self._file_cache.get(key)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        
         if file_path.suffix.lower() == '.csv':
-            return self.load_csv_data(file_path)
+            data = self.load_csv_data(file_path)
         elif file_path.suffix.lower() == '.json':
-            return self.load_json_data(file_path)
+            data = self.load_json_data(file_path)
         else:
             raise ValueError(f"Неподдерживаемый формат файла: {file_path.suffix}")
+        
+        self._file_cache[key] = (stat.st_mtime_ns, stat.st_size, data)
+        return data
     
-    def get_invoice_ids(self, data: List[Dict[str, Any]], file_path: Path) -> List[Any]:
+    def load_invoice_data(self, file_path: Path) -> List[Dict[str, Any]]:
         """
-        Извлекает список уникальных invoice_id из данных
+        Загружает счета из файла данных в едином для CSV и JSON виде
         
         Args:
-            data: Список словарей с данными
-            file_path: Путь к файлу (для определения структуры)
+            file_path: Путь к файлу данных
             
         Returns:
-            Список уникальных invoice_id
+            Список счетов {invoice_id, customer_id, date, items}
         """
-        invoice_ids = set()
+        return self._normalize(self.load_data_file(file_path), file_path.suffix.lower())
+    
+    def _normalize(self, data: List[Dict[str, Any]], suffix: str) -> List[Dict[str, Any]]:
+        """
+        Приводит данные счетов к единому виду: один словарь на счёт
         
-        # Для CSV файлов invoice может быть в каждой строке
-        if file_path.suffix.lower() == '.csv':
+        Args:
+            data: Список словарей с данными из файла
+            suffix: Расширение файла данных ('.csv' или '.json')
+            
+        Returns:
+            Список счетов {invoice_id, customer_id, date, items}
+        """
+        if suffix == '.csv':
+            # Для CSV каждая строка - это товар счёта, группируем строки по invoice_id,
+            # общие поля счёта берём из первой строки
+            grouped = defaultdict(list)
             for row in data:
                 if 'invoice_id' in row:
-                    invoice_ids.add(row['invoice_id'])
-        # Для JSON файлов invoice может быть в корне или в items
-        elif file_path.suffix.lower() == '.json':
-            for item in data:
-                if 'invoice_id' in item:
-                    invoice_ids.add(item['invoice_id'])
+                    _normalize_ids(row, ('invoice_id', 'customer_id', 'product_id'))
+                    grouped[row['invoice_id']].append(row)
+            
+            return [
+                {
+                    'invoice_id': invoice_id,
+                    'customer_id': rows[0].get('customer_id'),
+                    'date': rows[0].get('date'),
+                    'items': rows
+                }
+                for invoice_id, rows in grouped.items()
+            ]
         
-        return sorted(list(invoice_ids))
+        # Для JSON каждая запись уже является целым счётом
+        invoices = []
+        for invoice in data:
+            if 'invoice_id' in invoice:
+                _normalize_ids(invoice, ('invoice_id', 'customer_id'))
+                for item in invoice.get('items') or []:
+                    _normalize_ids(item, ('product_id',))
+                invoices.append(invoice)
+        return invoices
     
-    def get_invoice_data(self, data: List[Dict[str, Any]], invoice_id: Any, file_path: Path) -> Dict[str, Any]:
+    def _get_invoice_index(self, data: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает индекс счетов по invoice_id
+        
+        Args:
+            data: Список счетов, полученный из load_invoice_data
+            
+        Returns:
+            Словарь {invoice_id: данные счёта}
+        """
+        # Индекс строится один раз для каждого загруженного списка счетов
+        if self._invoice_index is not None and self._invoice_index_source is data:
+            return self._invoice_index
+        
+        # Для повторяющихся ID остаётся первый счёт. ID уже строки, кроме
+        # "invoice_id": null в JSON - такой счёт доступен как 'None', как и раньше
+        index = {}
+        for invoice in data:
+            index.setdefault(str(invoice['invoice_id']), invoice)
+        
+        self._invoice_index_source = data
+        self._invoice_index = index
+        return index
+    
+    def get_invoice_ids(self, data: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Извлекает список уникальных invoice_id из данных
+        
+        Args:
+            data: Список счетов, полученный из load_invoice_data
+            
+        Returns:
+            Список уникальных invoice_id
+        """
+        index = self._get_invoice_index(data)
+        
+        # Числовые ID сортируем по значению, остальные - как строки
+        return sorted(index.keys(), key=lambda i: (not i.isdecimal(), int(i) if i.isdecimal() else 0, i))
+    
+    def get_invoice_data(self, data: List[Dict[str, Any]], invoice_id: Any) -> Dict[str, Any]:
         """
         Получает данные конкретного счёта
         
         Args:
-            data: Все данные из файла
+            data: Список счетов, полученный из load_invoice_data
             invoice_id: ID счёта
-            file_path: Путь к файлу данных
             
         Returns:
             Словарь с данными счёта
         """
-        if file_path.suffix.lower() == '.csv':
-            # Для CSV собираем все строки с данным invoice_id
-            invoice_items = []
-            invoice_date = None
-            customer_id = None
-            
-            for row in data:
-                if str(row.get('invoice_id')) == str(invoice_id):
-                    invoice_items.append(row)
-                    if invoice_date is None:
-                        invoice_date = row.get('date')
-                    if customer_id is None:
-                        customer_id = row.get('customer_id')
+        invoice = self._get_invoice_index(data).get(str(invoice_id))
+        if invoice is None:
+            raise ValueError(f"Счёт с ID {invoice_id} не найден")
+        return invoice
+    
+    def _get_customer_index(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает индекс покупателей по customer_id
+        
+        Returns:
+            Словарь {str(customer_id): данные покупателя}
+        """
+        return self._get_index("customer", "customer_id")
+    
+    def _get_product_index(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает индекс товаров по product_id
+        
+        Returns:
+            Словарь {str(product_id): данные товара}
+        """
+        return self._get_index("product", "product_id")
+    
+    def _get_index(self, name: str, id_field: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает индекс записей по ID из файлов <name>.csv и <name>.json
+        
+        Индекс перестраивается только если изменился один из исходных файлов
+        
+        Args:
+            name: Имя файла без расширения
+            id_field: Поле с ID записи
             
-            return {
-                'invoice_id': invoice_id,
-                'customer_id': customer_id,
-                'date': invoice_date,
-                'items': invoice_items
-            }
-        else:  # JSON
-            for item in data:
-                if str(item.get('invoice_id')) == str(invoice_id):
-                    return item
-        
-        raise ValueError(f"Счёт с ID {invoice_id} не найден")
+        Returns:
+            Словарь {str(ID): запись}
+        """
+        # CSV имеет приоритет над JSON, поэтому идёт первым
+        sources = tuple(
+            self.load_data_file(file_path)
+            for file_path in (self.data_dir / f"{name}.csv", self.data_dir / f"{name}.json")
+            if file_path.exists()
+        )
+        
+        # load_data_file возвращает те же списки, пока файлы не изменились
+        cached = self._indices.get(name)
+        if cached is not None and len(cached[0]) == len(sources) \
+                and all(old is new for old, new in zip(cached[0], sources)):
+            return cached[1]
+        
+        # Для повторяющихся ID остаётся первая запись
+        index = {}
+        for rows in sources:
+            for row in rows:
+                index.setdefault(str(row.get(id_field)), row)
+        
+        self._indices[name] = (sources, index)
+        return index
     
     def load_customer_data(self, customer_id: Any) -> Optional[Dict[str, Any]]:
         """
@@ -217,23 +625,7 @@ class InvoiceGenerator:
         Returns:
             Словарь с данными покупателя или None
         """
-        # Пробуем загрузить из CSV
-        csv_file = self.data_dir / "customer.csv"
-        if csv_file.exists():
-            customers = self.load_csv_data(csv_file)
-            for customer in customers:
-                if str(customer.get('customer_id')) == str(customer_id):
-                    return customer
-        
-        # Пробуем загрузить из JSON
-        json_file = self.data_dir / "customer.json"
-        if json_file.exists():
-            customers = self.load_json_data(json_file)
-            for customer in customers:
-                if str(customer.get('customer_id')) == str(customer_id):
-                    return customer
-        
-        return None
+        return self._get_customer_index().get(str(customer_id))
     
     def load_product_data(self, product_id: Any) -> Optional[Dict[str, Any]]:
         """
@@ -245,79 +637,52 @@ class InvoiceGenerator:
         Returns:
             Словарь с данными товара или None
         """
-        # Пробуем загрузить из CSV
-        csv_file = self.data_dir / "product.csv"
-        if csv_file.exists():
-            products = self.load_csv_data(csv_file)
-            for product in products:
-                if str(product.get('product_id')) == str(product_id):
-                    return product
-        
-        # Пробуем загрузить из JSON
-        json_file = self.data_dir / "product.json"
-        if json_file.exists():
-            products = self.load_json_data(json_file)
-            for product in products:
-                if str(product.get('product_id')) == str(product_id):
-                    return product
-        
-        return None
+        return self._get_product_index().get(str(product_id))
     
-    def prepare_invoice_items(self, invoice_data: Dict[str, Any], file_path: Path) -> List[Dict[str, Any]]:
+    def prepare_invoice_items(self, invoice_data: Dict[str, Any]) -> InvoiceItems:
         """
         Подготавливает список товаров для счёта с полной информацией
         
         Args:
             invoice_data: Данные счёта
-            file_path: Путь к файлу данных
             
         Returns:
-            Список словарей с полной информацией о товарах
+            Товары счёта в виде колонок InvoiceItems
         """
-        items = []
+        products = self._get_product_index()
         
-        if file_path.suffix.lower() == '.csv':
-            # Для CSV items уже в invoice_data['items']
-            for item in invoice_data['items']:
-                product_id = item.get('product_id')
-                quantity = int(item.get('quantity', 1))
-                
-                product = self.load_product_data(product_id)
-                if product:
-                    price = float(product.get('price', 0))
-                    total = price * quantity
-                    
-                    items.append({
-                        'product_id': product_id,
-                        'name': product.get('name', 'Неизвестный товар'),
-                        'quantity': quantity,
-                        'price': price,
-                        'total': total
-                    })
-        else:  # JSON
-            # Для JSON items могут быть в invoice_data['items']
-            invoice_items = invoice_data.get('items', [])
-            for item in invoice_items:
-                product_id = item.get('product_id')
-                quantity = int(item.get('quantity', 1))
-                
-                product = self.load_product_data(product_id)
-                if product:
-                    price = float(product.get('price', 0))
-                    total = price * quantity
-                    
-                    items.append({
-                        'product_id': product_id,
-                        'name': product.get('name', 'Неизвестный товар'),
-                        'quantity': quantity,
-                        'price': price,
-                        'total': total
-                    })
-        
-        return items
+        # Сопоставляем позиции счёта с товарами, неизвестные товары пропускаем
+        product_ids = []
+        names = []
+        price_values = []
+        quantity_values = []
+        for item in invoice_data.get('items') or []:
+            product_id = item.get('product_id')
+            product = products.get(str(product_id))
+            if product:
+                product_ids.append(product_id)
+                names.append(product.get('name', 'Неизвестный товар'))
+                price_values.append(float(product.get('price', 0)))
+                quantity_values.append(int(item.get('quantity', 1)))
+        
+        # Суммы по позициям считаем векторно
+        prices = np.array(price_values, dtype=np.float64)
+        quantities = np.array(quantity_values, dtype=np.int64)
+        totals = np.empty(len(price_values), dtype=np.float64)
+        total_amount = _sum_totals(prices, quantities, totals)
+        
+        return InvoiceItems(
+            product_ids=product_ids,
+            names=names,
+            quantities=quantities,
+            prices=prices,
+            totals=totals,
+            total_amount=total_amount
+        )
     
     def generate_html(self, template_path: Path, invoice_data: Dict[str, Any], 
-                     customer_data: Dict[str, Any], items: List[Dict[str, Any]]) -> str:
+                     customer_data: Dict[str, Any], items: InvoiceItems,
+                     pdf_only: bool = True) -> str:
         """
         Генерирует HTML из шаблона с подстановкой данных
         Разбивает товары на группы по 10 записей на страницу
@@ -326,101 +691,30 @@ class InvoiceGenerator:
             template_path: Путь к HTML-шаблону
             invoice_data: Данные счёта
             customer_data: Данные покупателя
-            items: Список товаров
+            items: Товары счёта
+            pdf_only: HTML предназначен только для PDF - удалить бандлы стилей и скрипты
             
         Returns:
             HTML-строка с подставленными данными
         """
-        # Читаем шаблон
-        with open(template_path, 'r', encoding='utf-8') as f:
-            html_template = f.read()
-        
-        # Подставляем данные счёта
-        html = html_template.replace('{{invoice_id}}', str(invoice_data.get('invoice_id', '')))
-        html = html.replace('{{invoice_date}}', str(invoice_data.get('date', '')))
-        
-        # Подставляем данные покупателя
-        html = html.replace('{{customer_name}}', customer_data.get('name', ''))
-        html = html.replace('{{customer_email}}', customer_data.get('email', ''))
-        html = html.replace('{{customer_phone}}', customer_data.get('phone', ''))
-        html = html.replace('{{customer_address}}', customer_data.get('address', ''))
+        # Форматируем цены и суммы заранее, одним проходом по каждой колонке,
+        # чтобы цикл по строкам в шаблоне только выводил готовые строки
+        prices_str = list(map(MONEY_FORMAT.format, items.prices.tolist()))
+        totals_str = list(map(MONEY_FORMAT.format, items.totals.tolist()))
+        rows = list(zip(items.names, items.quantities.tolist(), prices_str, totals_str))
         
-        # Вычисляем итоговую сумму
-        total_amount = sum(item['total'] for item in items)
-        
-        # Разбиваем товары на группы по 10 записей
-        items_per_page = 10
-        tables_html = ""
-        
-        for page_num in range(0, len(items), items_per_page):
-            page_items = items[page_num:page_num + items_per_page]
-            is_first_page = (page_num == 0)
-            
-            # Для первой страницы - обычная таблица
-            # Для последующих - добавляем разрыв страницы и повторяем шапку
-            if not is_first_page:
-                # Добавляем разрыв страницы и повторяем шапку счёта
-                tables_html += f"""
-    <div class="page-break"></div>
-    <div class="header-repeat">
-        <h2>Счёт №{invoice_data.get('invoice_id', '')}</h2>
-        <div class="header-repeat-info">
-            <div class="header-repeat-info-row">
-                <div class="header-repeat-info-cell header-repeat-info-label">Дата:</div>
-                <div class="header-repeat-info-cell">{invoice_data.get('date', '')}</div>
-            </div>
-        </div>
-        <div class="header-repeat-customer">
-            <h3>Покупатель:</h3>
-            <div class="header-repeat-customer-details">
-                <p><strong>{customer_data.get('name', '')}</strong></p>
-                <p>Email: {customer_data.get('email', '')}</p>
-                <p>Телефон: {customer_data.get('phone', '')}</p>
-                <p>Адрес: {customer_data.get('address', '')}</p>
-            </div>
-        </div>
-    </div>
-"""
-            
-            # Генерируем таблицу для текущей страницы
-            items_rows = ""
-            for idx, item in enumerate(page_items, 1):
-                global_idx = page_num + idx
-                items_rows += f"""
-            <tr>
-                <td class="text-center">{global_idx}</td>
-                <td>{item['name']}</td>
-                <td class="text-center">{item['quantity']}</td>
-                <td class="text-right">{item['price']:,.2f} ₽</td>
-                <td class="text-right">{item['total']:,.2f} ₽</td>
-            </tr>
-"""
-            
-            # Добавляем таблицу
-            tables_html += f"""
-    <div class="table-container">
-        <table>
-            <thead>
-                <tr>
-                    <th style="width: 5%;">№</th>
-                    <th style="width: 45%;">Наименование товара</th>
-                    <th style="width: 10%;" class="text-center">Кол-во</th>
-                    <th style="width: 15%;" class="text-right">Цена за шт.</th>
-                    <th style="width: 15%;" class="text-right">Сумма</th>
-                </tr>
-            </thead>
-            <tbody>
-                {items_rows}
-            </tbody>
-        </table>
-    </div>
-"""
-        
-        # Подставляем таблицы и итоговую сумму
-        html = html.replace('{{tables}}', tables_html)
-        html = html.replace('{{total_amount}}', f"{total_amount:,.2f}")
-        
-        return html
+        # Разбиение товаров на страницы выполняет сам шаблон (фильтр batch)
+        # Шаблон ищется по полному пути, а не по имени в templates_dir
+        env = self._jinja_pdf_env if pdf_only else self._jinja_env
+        template = env.get_template(str(template_path.resolve()))
+        return template.render(
+            invoice=invoice_data,
+            customer=customer_data,
+            items=items,
+            rows=rows,
+            total=items.total_amount,
+            items_per_page=ITEMS_PER_PAGE
+        )
     
     def generate_pdf(self, html_content: str, output_path: Path):
         """
@@ -430,45 +724,30 @@ class InvoiceGenerator:
             html_content: HTML-контент
             output_path: Путь для сохранения PDF
         """
-        # CSS для поддержки кириллицы и пагинации
-        # Разрывы страниц контролируются через класс .page-break
-        css = CSS(string='''
-            @page {
-                size: A4;
-                margin: 2cm 2cm 3cm 2cm;
-            }
-            
-            body {
-                font-family: 'DejaVu Sans', Arial, sans-serif;
-            }
-            
-            .page-break {
-                page-break-before: always;
-            }
-            
-            table {
-                page-break-inside: avoid;
-            }
-            
-            thead {
-                display: table-header-group;
-            }
-            
-            tbody tr {
-                page-break-inside: avoid;
-            }
-            
-            .total-section {
-                page-break-inside: avoid;
-            }
-        ''', font_config=self.font_config)
-        
-        # Генерируем PDF
+        # Генерируем PDF, стили берём из заранее разобранного CSS
         HTML(string=html_content).write_pdf(
             output_path,
-            stylesheets=[css],
+            stylesheets=[self._css],
+            font_config=self.font_config,
+            presentational_hints=False,
+            optimize_images=False
+        )
+    
+    def warm_up(self):
+        """
+        Прогревает кэш шрифтов WeasyPrint генерацией пустого документа
+        
+        Убирает задержку поиска шрифтов при генерации первого счёта
+        """
+        if self._warmed_up:
+            return
+        
+        HTML(string='<p>warmup</p>').write_pdf(
+            io.BytesIO(),
+            stylesheets=[self._css],
             font_config=self.font_config
         )
+        self._warmed_up = True
     
     def open_pdf(self, pdf_path: Path):
         """
@@ -477,14 +756,7 @@ class InvoiceGenerator:
         Args:
             pdf_path: Путь к PDF файлу
         """
-        system = platform.system()
-        
-        if system == 'Windows':
-            os.startfile(str(pdf_path))
-        elif system == 'Darwin':  # macOS
-            subprocess.run(['open', str(pdf_path)])
-        else:  # Linux
-            subprocess.run(['xdg-open', str(pdf_path)])
+        _OPEN_PDF(pdf_path)
     
     def run(self):
         """Основной метод для запуска генератора"""
@@ -556,13 +828,13 @@ class InvoiceGenerator:
         
         # Загружаем данные
         try:
-            data = self.load_data_file(selected_data_file)
+            data = self.load_invoice_data(selected_data_file)
         except Exception as e:
             print(f"Ошибка при загрузке данных: {e}")
             return
         
         # Получаем список invoice_id
-        invoice_ids = self.get_invoice_ids(data, selected_data_file)
+        invoice_ids = self.get_invoice_ids(data)
         if not invoice_ids:
             print("Ошибка: не найдено счетов в файле данных.")
             return
@@ -596,7 +868,7 @@ class InvoiceGenerator:
         
         # Получаем данные счёта
         try:
-            invoice_data = self.get_invoice_data(data, selected_invoice_id, selected_data_file)
+            invoice_data = self.get_invoice_data(data, selected_invoice_id)
         except Exception as e:
             print(f"Ошибка при получении данных счёта: {e}")
             return
@@ -613,7 +885,7 @@ class InvoiceGenerator:
             return
         
         # Подготавливаем товары
-        items = self.prepare_invoice_items(invoice_data, selected_data_file)
+        items = self.prepare_invoice_items(invoice_data)
         if not items:
             print("Ошибка: не найдено товаров в счёте.")
             return
@@ -643,6 +915,109 @@ class InvoiceGenerator:
         except Exception as e:
             print(f"Не удалось открыть PDF автоматически: {e}")
             print(f"PDF сохранён в: {output_path}")
+    
+    def run_batch(self, data_file: Path, template_path: Path,
+                  invoice_ids: Optional[List[Any]] = None,
+                  max_workers: Optional[int] = None) -> List[Path]:
+        """
+        Генерирует PDF для нескольких счетов параллельно в отдельных процессах
+        
+        Данные, индексы покупателей и товаров готовятся один раз в основном
+        процессе, в обработчики передаются только готовые словари
+        
+        Args:
+            data_file: Путь к файлу данных со счетами
+            template_path: Путь к HTML-шаблону
+            invoice_ids: Список ID счетов (по умолчанию - все счета из файла)
+            max_workers: Количество процессов (по умолчанию - как в ProcessPoolExecutor, по числу ядер)
+            
+        Returns:
+            Список путей к созданным PDF-файлам
+        """
+        data = self.load_invoice_data(data_file)
+        if invoice_ids is None:
+            invoice_ids = self.get_invoice_ids(data)
+        
+        # Повторяющиеся ID убираем с сохранением порядка, иначе несколько
+        # процессов будут одновременно писать в один и тот же PDF
+        invoice_ids = list(dict.fromkeys(str(invoice_id) for invoice_id in invoice_ids))
+        
+        # Готовим задания для обработчиков
+        tasks = []
+        for invoice_id in invoice_ids:
+            try:
+                invoice_data = self.get_invoice_data(data, invoice_id)
+            except ValueError:
+                print(f"Счёт №{invoice_id} пропущен: счёт не найден.")
+                continue
+            
+            customer_data = self.load_customer_data(invoice_data.get('customer_id'))
+            if not customer_data:
+                print(f"Счёт №{invoice_id} пропущен: покупатель не найден.")
+                continue
+            
+            items = self.prepare_invoice_items(invoice_data)
+            if not items:
+                print(f"Счёт №{invoice_id} пропущен: не найдено товаров.")
+                continue
+            
+            output_path = self.output_dir / f"invoice_{invoice_id}.pdf"
+            tasks.append((template_path, invoice_data, customer_data, items, output_path))
+        
+        if not tasks:
+            return []
+        
+        # При запуске через fork обработчики наследуют готовый генератор вместе
+        # с кэшем шрифтов (copy-on-write), поэтому прогреваем его в основном процессе.
+        # На Windows и macOS процессы запускаются через spawn, и каждый
+        # обработчик создаёт и прогревает свой генератор сам
+        if sys.platform.startswith('linux'):
+            mp_context = multiprocessing.get_context('fork')
+            self.warm_up()
+        else:
+            mp_context = None
+        
+        global _worker_generator
+        _worker_generator = self
+        try:
+            # WeasyPrint упирается в CPU и GIL, поэтому масштабируемся процессами, а не потоками
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=mp_context,
+                initializer=_init_worker,
+                initargs=(str(self.data_dir), str(self.templates_dir), str(self.output_dir))
+            ) as executor:
+                return list(executor.map(_render_one, tasks))
+        finally:
+            _worker_generator = None
+
+
+# Генератор счетов внутри процесса-обработчика run_batch
+_worker_generator: Optional[InvoiceGenerator] = None
+
+
+def _init_worker(data_dir: str, templates_dir: str, output_dir: str):
+    """Создаёт генератор счетов в процессе-обработчике, если он не унаследован через fork"""
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = InvoiceGenerator(data_dir, templates_dir, output_dir)
+        _worker_generator.warm_up()
+
+
+def _render_one(task: tuple) -> Path:
+    """
+    Генерирует PDF одного счёта в процессе-обработчике
+    
+    Args:
+        task: Кортеж (template_path, invoice_data, customer_data, items, output_path)
+        
+    Returns:
+        Путь к созданному PDF-файлу
+    """
+    template_path, invoice_data, customer_data, items, output_path = task
+    html_content = _worker_generator.generate_html(template_path, invoice_data, customer_data, items)
+    _worker_generator.generate_pdf(html_content, output_path)
+    return output_path
 
 
 def main():